@@ -6,43 +6,53 @@ To run the 'microsaccade bias colour vs. duration' experiment, see main.py.
 made by Anna van Harmelen, 2025
 """
 
-import random
+import numpy as np
 from stimuli import show_text
 from response import wait_for_key
-from psychopy import event
 
+BREAK_TEMPLATES = {
+    "duration": "In the previous block, your reports were on average off by {avg_score}.",
+    "colour": "In the previous block, you scored {avg_score} on average.",
+}
 
-def create_trial_list(n_trials):
+
+def create_trial_list(n_trials, rng):
     if n_trials % 8 != 0:
         raise Exception(
             "Expected number of trials to be divisible by 8, otherwise perfect factorial combinations are not possible."
         )
 
     # Generate equal distribution of target items
-    target_item = n_trials // 2 * [1, 2]
+    target_item = np.tile([1, 2], n_trials // 2)
 
     # Generate equal distribution of stimulus durations
-    target_duration = n_trials // 4 * (2 * ["short"] + 2 * ["long"])
+    target_duration = np.tile(np.repeat(["short", "long"], 2), n_trials // 4)
 
     # Determine locations counterweighted with durations
-    target_position = n_trials // 2 * (4 * ["left"] + 4 * ["right"])
+    target_position = np.tile(np.repeat(["left", "right"], 4), n_trials // 8)
+
+    # Shuffle all trial parameters with one shared permutation
+    order = rng.permutation(n_trials)
 
     # Create trial parameters for all trials
-    trials = list(zip(target_position, target_duration, target_item))
-    random.shuffle(trials)
+    trials = list(
+        zip(
+            target_position[order].tolist(),
+            target_duration[order].tolist(),
+            target_item[order].tolist(),
+        )
+    )
 
     return trials
 
 
 def block_break(current_block, n_blocks, block_type, avg_score, settings, eyetracker):
+    window = settings["window"]
+    keyboard = settings["keyboard"]
+
     blocks_left = n_blocks - current_block
 
-    if block_type == "duration":
-        break_string = (
-            f"In the previous block, your reports were on average off by {avg_score}."
-        )
-    elif block_type == "colour":
-        break_string = f"In the previous block, you scored {avg_score} on average."
+    break_string = BREAK_TEMPLATES[block_type].format(avg_score=avg_score)
 
     show_text(
         break_string
@@ -50,32 +60,30 @@ def block_break(current_block, n_blocks, block_type, avg_score, settings, eyetra
         f"have {blocks_left} block{'s' if blocks_left != 1 else ''} left. "
         "Take a break if you want to, but try not to move your head during this break."
         "\n\nPress SPACE when you're ready to continue.",
-        settings["window"],
+        window,
     )
-    settings["window"].flip()
+    window.flip()
 
     if eyetracker:
-        keys = wait_for_key(["space", "c"], settings["keyboard"])
+        keys = wait_for_key(["space", "c"], keyboard)
         if "c" in keys:
             eyetracker.calibrate()
             eyetracker.start()
             return True
     else:
-        wait_for_key(["space"], settings["keyboard"])
+        wait_for_key(["space"], keyboard)
 
     # Make sure any clicks made during the break aren't saved
-    event.Mouse(visible=False, win=settings["window"]).clickReset()
+    settings["mouse"].clickReset()
 
     return False
 
 
 def long_break(n_blocks, block_type, avg_score, settings, eyetracker):
-    if block_type == "duration":
-        break_string = (
-            f"In the previous block, your reports were on average off by {avg_score}."
-        )
-    elif block_type == "colour":
-        break_string = f"In the previous block, you scored {avg_score} on average."
+    window = settings["window"]
+    keyboard = settings["keyboard"]
+
+    break_string = BREAK_TEMPLATES[block_type].format(avg_score=avg_score)
 
     show_text(
         break_string
@@ -83,41 +91,48 @@ def long_break(n_blocks, block_type, avg_score, settings, eyetracker):
         "Now is the time to take a longer break. Maybe get up, stretch, walk around."
         "The next part "
         "\n\nPress SPACE whenever you're ready to continue again.",
-        settings["window"],
+        window,
     )
-    settings["window"].flip()
+    window.flip()
 
     if eyetracker:
-        keys = wait_for_key(["space", "c"], settings["keyboard"])
+        keys = wait_for_key(["space", "c"], keyboard)
         if "c" in keys:
             eyetracker.calibrate()
             return True
     else:
-        wait_for_key(["space"], settings["keyboard"])
+        wait_for_key(["space"], keyboard)
 
     # Make sure any clicks made during the break aren't saved
-    event.Mouse(visible=False, win=settings["window"]).clickReset()
+    settings["mouse"].clickReset()
 
     return False
 
 
 def finish(n_blocks, settings):
+    window = settings["window"]
+    keyboard = settings["keyboard"]
+
     show_text(
         f"Congratulations! You successfully finished all {n_blocks} blocks! "
         "You're completely done now. Press SPACE to exit the experiment.",
-        settings["window"],
+        window,
     )
-    settings["window"].flip()
+    window.flip()
 
-    wait_for_key(["space"], settings["keyboard"])
+    wait_for_key(["space"], keyboard)
 
 
 def quick_finish(settings):
-    settings["window"].flip()
+    window = settings["window"]
+    keyboard = settings["keyboard"]
+
+    # Throw away whatever was half-drawn when the experiment stopped, without waiting for a flip
+    window.clearBuffer()
     show_text(
         f"You've exited the experiment. Press SPACE to close this window.",
-        settings["window"],
+        window,
     )
-    settings["window"].flip()
+    window.flip()
 
-    wait_for_key(["space"], settings["keyboard"])
+    wait_for_key(["space"], keyboard)
@@ -10,7 +10,7 @@ from psychopy import visual, event
 import numpy as np
 from response import evaluate_colour_response
 from block import create_trial_list
-from trial import generate_trial_characteristics
+from trial import generate_trial_characteristics, draw_random_trial_values
 import random
 
 my_list = [(1, 2), (3, 4), (5, 6)]
@@ -38,10 +38,11 @@ my_list = random.sample(settings["colours"], 2)
 a, b = my_list
 
 
-trials = create_trial_list(16)
+trials = create_trial_list(16, np.random.default_rng())
 print(trials[:2])
 
-print(generate_trial_characteristics(("right", "long", 1), settings))
+random_values = draw_random_trial_values(1, settings, np.random.default_rng())
+print(generate_trial_characteristics(("right", "long", 1), random_values[0]))
 
 
 # Parameters for the color wheel
@@ -145,4 +146,8 @@ while not selected_color:
 settings["window"].close()
 
 # Evaluate the response
-print(evaluate_colour_response(selected_color, colors[0], colors))
+print(
+    evaluate_colour_response(
+        selected_color, colors[0], {tuple(c): i for i, c in enumerate(colors)}
+    )
+)
@@ -7,6 +7,7 @@ made by Anna van Harmelen, 2025, using code by Rose Nasrawi & Baiwei Liu
 """
 
 from lib import eyelinker
+from functools import lru_cache
 import os
 
 
@@ -47,6 +48,7 @@ class Eyelinker:
         self.tracker.close_edf()
 
 
+@lru_cache(maxsize=None)
 def get_trigger(frame, block_type, target_position, target_duration, target_item):
     condition_marker = {"colour": 1, "duration": 9}[block_type]
 
@@ -67,3 +69,12 @@ def get_trigger(frame, block_type, target_position, target_duration, target_item
         "response_offset": "5",
         "feedback_onset": "6",
     }[frame] + str(condition_marker)
+
+
+@lru_cache(maxsize=None)
+def get_trigger_message(frame, block_type, target_position, target_duration, target_item):
+    # The message that is sent to the eyetracker, ready-made per condition
+    trigger = get_trigger(
+        frame, block_type, target_position, target_duration, target_item
+    )
+    return f"trig{trigger}"
@@ -6,17 +6,23 @@ see README.md for instructions if needed
 """
 
 # Import necessary stuff
+import argparse
+import csv
 import traceback
-from psychopy import core, event, logging
-import pandas as pd
-from participantinfo import get_participant_details
+from pathlib import Path
+from psychopy import core, logging
+from participantinfo import get_participant_details, read_participants
 from set_up import get_monitor_and_dir, get_settings
 from eyetracker import Eyelinker
 from practice import practice
 from stimuli import initialise_all_stimuli
-from trial import single_trial, generate_trial_characteristics
-from time import time
-from numpy import mean
+from trial import (
+    single_trial,
+    generate_trial_characteristics,
+    draw_random_trial_values,
+)
+from time import perf_counter
+from numpy.random import default_rng
 
 
 # from practice import practice
@@ -33,7 +39,36 @@ N_BLOCKS = 10
 TRIALS_PER_BLOCK = 40
 
 
-def main():
+def write_data(rows, data_file, writer=None):
+    """
+    Append `rows` to the already opened `data_file`, creating the csv writer
+    (and writing the header) the first time round. Returns the writer so it
+    can be reused for the next block.
+    """
+    # Trial timings are kept in seconds during the block, format them only now
+    # (into new rows, so the block's own rows can still be written again if this fails)
+    rows = [
+        {
+            **row,
+            "start_time": str(dt.timedelta(seconds=row["start_time"])),
+            "end_time": str(dt.timedelta(seconds=row["end_time"])),
+        }
+        for row in rows
+    ]
+
+    if writer is None:
+        writer = csv.DictWriter(data_file, fieldnames=rows[0].keys())
+        writer.writeheader()
+
+    writer.writerows(rows)
+
+    # Make sure this block's data is on disk, in case the experiment crashes later on
+    data_file.flush()
+
+    return writer
+
+
+def main(testing=False, n_blocks=N_BLOCKS):
     """
     Data formats / storage:
      - eyetracking data saved in one .edf file per session
@@ -44,23 +79,12 @@ def main():
     # first things first: ignore warnings
     logging.console.setLevel(logging.ERROR)
 
-    # Set whether this is a test run or not
-    testing = False
-
     # Get monitor and directory information
     monitor, directory = get_monitor_and_dir(testing)
 
     # Get participant details and save in same file as before
-    old_participants = pd.read_csv(
-        rf"{directory}\participantinfo.csv",
-        dtype={
-            "participant_number": int,
-            "session_number": int,
-            "age": int,
-            "start_block_type": str,
-            "trials_completed": str,
-        },
-    )
+    participants_path = Path(directory) / "participantinfo.csv"
+    old_participants = read_participants(participants_path)
     new_participants, current_block_type = get_participant_details(
         old_participants, testing
     )
@@ -69,11 +93,19 @@ def main():
     settings = get_settings(monitor, directory)
     settings["keyboard"].clearEvents()
 
+    # Look up session details once
+    participant_id = new_participants.rows[-1]["participant_number"]
+    session_id = new_participants.rows[-1]["session_number"]
+    data_path = (
+        Path(settings["directory"])
+        / f"data_session_{session_id}_{current_block_type}.csv"
+    )
+
     # Connect to eyetracker and calibrate it
     if not testing:
         eyelinker = Eyelinker(
-            new_participants.participant_number.iloc[-1],
-            new_participants.session_number.iloc[-1],
+            participant_id,
+            session_id,
             current_block_type[0],
             settings["window"],
             settings["directory"],
@@ -91,90 +123,101 @@ def main():
     practice(current_block_type, stimuli, settings)
 
     # Initialise some stuff
-    start_of_experiment = time()
+    start_of_experiment = perf_counter()
     data = []
     current_trial = 0
     finished_early = True
-    event.Mouse(visible=False, win=settings["window"])
+    settings["mouse"].setVisible(False)
+
+    # Seed trial order per participant and session, so it can be reproduced later
+    # (session_number is shared by both sessions of a participant, session_within_pp isn't)
+    session_within_pp = int(new_participants.rows[-1]["session_within_pp"])
+    rng = default_rng([participant_id, session_within_pp])
+
+    # Open data file once for the whole session
+    data_file = open(data_path, "w", newline="")
+    data_writer = None
+
+    # Ask the OS to schedule this process at high priority while trials are running
+    core.rush(True)
 
     # Start experiment
     try:
-        for block_nr in range(2 if testing else N_BLOCKS):
+        for block_nr in range(2 if testing else n_blocks):
 
             # Pseudo-randomly create conditions and target locations (so they're weighted)
-            trials = create_trial_list(8 if testing else TRIALS_PER_BLOCK)
+            trials = create_trial_list(8 if testing else TRIALS_PER_BLOCK, rng)
+
+            # Draw the random ITIs, durations and colours for the whole block at once
+            random_values = draw_random_trial_values(len(trials), settings, rng)
 
-            # Create temporary variable for saving block performance
-            block_performance = []
+            # Create temporary variables for saving block data and performance
+            data = [None] * len(trials)
+            performance_sum = 0
+
+            # Count dropped frames from the start of this block
+            # (turning recording on skips the interval since the last flip, i.e. the break)
+            settings["window"].frameIntervals = []
+            settings["window"].nDroppedFrames = 0
+            settings["window"].recordFrameIntervals = True
 
             # Run trials per pseudo-randomly created info
-            for trial in trials:
+            for trial_index, (trial, trial_values) in enumerate(
+                zip(trials, random_values)
+            ):
                 current_trial += 1
-                start_time = time()
+                start_time = perf_counter()
 
-                trial_characteristics: dict = generate_trial_characteristics(
-                    trial, settings
-                )
+                spec = generate_trial_characteristics(trial, trial_values)
 
                 # Generate trial
                 report: dict = single_trial(
-                    **trial_characteristics,
+                    spec,
                     block_type=current_block_type,
                     stimuli=stimuli,
                     settings=settings,
                     testing=testing,
                     eyetracker=None if testing else eyelinker,
                 )
-                end_time = time()
+                end_time = perf_counter()
 
                 # Save trial data
-                data.append(
-                    {
-                        "trial_number": current_trial,
-                        "block": block_nr + 1,
-                        "start_time": str(
-                            dt.timedelta(seconds=(start_time - start_of_experiment))
-                        ),
-                        "end_time": str(
-                            dt.timedelta(seconds=(end_time - start_of_experiment))
-                        ),
-                        **trial_characteristics,
-                        **report,
-                    }
-                )
+                trial_characteristics = spec._asdict()
+                trial_characteristics["trial_number"] = current_trial
+                trial_characteristics["block"] = block_nr + 1
+                trial_characteristics["start_time"] = start_time - start_of_experiment
+                trial_characteristics["end_time"] = end_time - start_of_experiment
+                trial_characteristics.update(report)
+                data[trial_index] = trial_characteristics
 
                 if current_block_type == "colour":
-                    block_performance.append(report["performance"])
+                    performance_sum += report["performance"]
                 elif current_block_type == "duration":
-                    block_performance.append(int(report["duration_diff_abs"]))
+                    performance_sum += int(report["duration_diff_abs"])
+
+            # Stop counting, the break screens aren't timed
+            settings["window"].recordFrameIntervals = False
+
+            # Let the experimenter know if this block's timing can't be trusted
+            if settings["window"].nDroppedFrames > 0:
+                print(
+                    f"Block {block_nr + 1}: {settings['window'].nDroppedFrames} dropped frames"
+                )
 
             # Calculate average performance score for most recent block
-            avg_score = round(mean(block_performance))
+            avg_score = round(performance_sum / len(trials))
 
             # Write this block's data to file
-            if block_nr == 0:
-                pd.DataFrame(data).to_csv(
-                    rf"{settings['directory']}\data_session_{new_participants.session_number.iloc[-1]}_{current_block_type}.csv",
-                    header=True,
-                    index=False,
-                    mode="w",
-                )
-            else:
-                pd.DataFrame(data).to_csv(
-                    rf"{settings['directory']}\data_session_{new_participants.session_number.iloc[-1]}_{current_block_type}.csv",
-                    header=False,
-                    index=False,
-                    mode="a",
-                )
+            data_writer = write_data(data, data_file, data_writer)
             data.clear()
 
             # Break after end of block, unless it's the last block.
             # Experimenter can re-calibrate the eyetracker by pressing 'c' here.
             calibrated = True
-            if block_nr + 1 == N_BLOCKS // 2:
+            if block_nr + 1 == n_blocks // 2:
                 while calibrated:
                     calibrated = long_break(
-                        N_BLOCKS,
+                        n_blocks,
                         current_block_type,
                         avg_score,
                         settings,
@@ -183,11 +226,11 @@ def main():
                 if not testing:
                     eyelinker.start()
 
-            elif block_nr + 1 < N_BLOCKS:
+            elif block_nr + 1 < n_blocks:
                 while calibrated:
                     calibrated = block_break(
                         block_nr + 1,
-                        N_BLOCKS,
+                        n_blocks,
                         current_block_type,
                         avg_score,
                         settings,
@@ -203,46 +246,50 @@ def main():
         traceback.print_exc()
 
     finally:
+        # Back to normal priority, so saving and the eyetracker transfer don't starve the OS
+        core.rush(False)
+
         # Stop eyetracker (this should also save the data)
         if not testing:
             eyelinker.stop()
 
         # Register how many trials this participant has completed
-        new_participants.loc[new_participants.index[-1], "trials_completed"] = str(
-            current_trial - 1
-        )
+        new_participants.rows[-1]["trials_completed"] = str(current_trial - 1)
 
         # Save participant data to existing .csv file
-        new_participants.to_csv(
-            rf"{settings['directory']}\participantinfo.csv", index=False
-        )
+        new_participants.save(participants_path)
+
+        # Save data collected up until this point in the block (only left over if finished early)
+        try:
+            unsaved_data = [row for row in data if row is not None]
+            if unsaved_data:
+                write_data(unsaved_data, data_file, data_writer)
+        except Exception as e:
+            print("An error occurred while saving the remaining trial data:")
+            print(e.__class__.__name__ + ": " + str(e))
+            traceback.print_exc()
+        finally:
+            data_file.close()
 
         # Done!
         if finished_early:
-            # Save data collected up until this point in the block
-            if block_nr == 0:
-                pd.DataFrame(data).to_csv(
-                    rf"{settings['directory']}\data_session_{new_participants.session_number.iloc[-1]}_{current_block_type}.csv",
-                    header=True,
-                    index=False,
-                    mode="w",
-                )
-            else:
-                pd.DataFrame(data).to_csv(
-                    rf"{settings['directory']}\data_session_{new_participants.session_number.iloc[-1]}_{current_block_type}.csv",
-                    header=False,
-                    index=False,
-                    mode="a",
-                )
-
             # Display quick_finish message
             quick_finish(settings)
         else:
             # Thanks for meedoen
-            finish(N_BLOCKS, settings)
+            finish(n_blocks, settings)
 
         core.quit()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--testing", action="store_true", help="test run on the laptop set-up"
+    )
+    parser.add_argument(
+        "--blocks", type=int, default=N_BLOCKS, help="number of experimental blocks"
+    )
+    args = parser.parse_args()
+
+    main(args.testing, args.blocks)
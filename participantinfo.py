@@ -6,25 +6,59 @@ To run the 'microsaccade bias colour vs. duration' experiment, see main.py.
 made by Anna van Harmelen, 2025
 """
 
+import csv
 import random
-import pandas as pd
+from dataclasses import dataclass
 
 BLOCK_OPTIONS = ["colour", "duration"]
+INT_COLUMNS = ["participant_number", "session_number", "age"]
 
 
-def get_participant_details(existing_participants: pd.DataFrame, testing):
+@dataclass
+class ParticipantLog:
+    """
+    The rows of participantinfo.csv, as a list of dicts in file order.
+    Read a column with `column`, e.g. participants.column("age").
+    """
+
+    rows: list
+
+    def column(self, name):
+        return [row[name] for row in self.rows]
+
+    def save(self, path):
+        # Only needed once at the very end, so don't import pandas at start-up
+        import pandas as pd
+
+        pd.DataFrame(self.rows).to_csv(path, index=False)
+
+
+def read_participants(path):
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+
+    for row in rows:
+        for name in INT_COLUMNS:
+            if row.get(name):
+                row[name] = int(row[name])
+
+    return ParticipantLog(rows)
+
+
+def get_participant_details(existing_participants: ParticipantLog, testing):
 
     # Determine if this is first or second session of pp
-    pp_id_list = existing_participants.participant_number.tolist()
+    pp_id_list = existing_participants.column("participant_number")
 
     if len(pp_id_list) == 1 or pp_id_list[-1] == pp_id_list[-2]:
         # This must be this participant's first session
         current_session = 1
 
         # Generate random & unique participant number
-        participant = random.randint(10, 99)
-        while participant in existing_participants.participant_number.tolist():
-            participant = random.randint(10, 99)
+        available_numbers = sorted(set(range(10, 100)) - set(pp_id_list))
+        if not available_numbers:
+            raise Exception("All participant numbers between 10 and 99 are in use.")
+        participant = random.choice(available_numbers)
 
         # Get participant age if not a trial-run
         if not testing:
@@ -34,7 +68,7 @@ def get_participant_details(existing_participants: pd.DataFrame, testing):
 
         # Determine starting block type
 
-        previous_start_block_type = existing_participants.start_block_type.tolist()[-1]
+        previous_start_block_type = existing_participants.rows[-1]["start_block_type"]
         if previous_start_block_type == "0":
             start_block_type = BLOCK_OPTIONS[0]
         else:
@@ -44,14 +78,14 @@ def get_participant_details(existing_participants: pd.DataFrame, testing):
             start_block_type = BLOCK_OPTIONS[idx]
 
         # Insert session number
-        session = max(existing_participants.session_number) + 1
+        session = max(existing_participants.column("session_number")) + 1
 
     else:
         current_session = 2
         participant = pp_id_list[-1]
-        age = existing_participants.age.tolist()[-1]
-        start_block_type = existing_participants.start_block_type.tolist()[-1]
-        session = max(existing_participants.session_number)
+        age = existing_participants.rows[-1]["age"]
+        start_block_type = existing_participants.rows[-1]["start_block_type"]
+        session = max(existing_participants.column("session_number"))
 
     # Determine current block type
     current_block = (
@@ -67,21 +101,18 @@ def get_participant_details(existing_participants: pd.DataFrame, testing):
     print(f"Block type: {current_block}")
 
     # Add newly made participant
-    new_participant = pd.DataFrame(
+    existing_participants.rows.append(
         {
-            "participant_number": [participant],
-            "session_number": [session],
-            "session_within_pp": [current_session],
-            "age": [age],
-            "start_block_type": [start_block_type],
-            "current_block_type": [current_block],
+            "participant_number": participant,
+            "session_number": session,
+            "session_within_pp": current_session,
+            "age": age,
+            "start_block_type": start_block_type,
+            "current_block_type": current_block,
         }
     )
-    all_participants = pd.concat(
-        [existing_participants, new_participant], ignore_index=True
-    )
 
     # Break before return so experimenter has a chance to show the instruction powerpoint
     input("Instruction powerpoint shown? (y/n)  ")
 
-    return all_participants, current_block
+    return existing_participants, current_block
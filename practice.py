@@ -21,11 +21,19 @@ from response import (
     check_quit,
     get_duration_response,
 )
-from trial import generate_trial_characteristics, single_trial
-from psychopy import event, visual, core
+from trial import (
+    draw_random_trial_values,
+    generate_trial_characteristics,
+    single_trial,
+    show_for_frames,
+)
+from block import create_trial_list
+from psychopy import visual
 from time import sleep
+from itertools import cycle
 import random
 from numpy import mean
+from numpy.random import default_rng
 
 
 def practice(block_type, stimuli, settings):
@@ -45,6 +53,17 @@ def practice_colour_wheel(stimuli, settings):
         performance = []
         stimuli["stimulus"].pos = (0, 0)
 
+        # Create feedback text once, only its text changes per response
+        feedback_text = visual.TextStim(
+            win=settings["window"],
+            text="",
+            font="Courier New",
+            height=22,
+            pos=(0, 0),
+            color=[-1, -1, -1],
+            bold=True,
+        )
+
         while True:
             # Create circle to indicate target colour
             target_colour = random.choice(settings["colours"])
@@ -69,15 +88,8 @@ def practice_colour_wheel(stimuli, settings):
 
             # Give feedback
             stimuli["stimulus"].draw()
-            visual.TextStim(
-                win=settings["window"],
-                text=f"{response['performance']}",
-                font="Courier New",
-                height=22,
-                pos=(0, 0),
-                color=[-1, -1, -1],
-                bold=True,
-            ).draw()
+            feedback_text.text = str(response["performance"])
+            feedback_text.draw()
             settings["window"].flip()
             sleep(0.5)
 
@@ -94,7 +106,7 @@ def practice_colour_wheel(stimuli, settings):
         wait_for_key(["space"], settings["keyboard"])
 
         # Make sure any clicks made during the break aren't saved
-        event.Mouse(visible=False, win=settings["window"]).clickReset()
+        settings["mouse"].clickReset()
 
 
 def practice_duration_response(stimuli, settings):
@@ -103,33 +115,44 @@ def practice_duration_response(stimuli, settings):
         performance = []
 
         # Make sure any clicks made during the break aren't saved
-        event.Mouse(visible=False, win=settings["window"]).clickReset()
+        settings["mouse"].clickReset()
+
+        # Draw the pauses between responses (1500-2000 ms) and the durations up front
+        rng = default_rng()
+        pauses = cycle((rng.integers(1500, 2001, size=100) / 1000).tolist())
+        random_values = cycle(draw_random_trial_values(100, settings, rng))
 
         while True:
             # Show fixation dot in preparation
-            draw_fixation_dot(stimuli["fixation_dot"], settings)
-            settings["window"].flip()
-            sleep(0.5)
+            show_for_frames(
+                0.5,
+                lambda: draw_fixation_dot(stimuli["fixation_dot"], settings),
+                settings,
+            )
 
             # Show central square with certain duration
             stimulus = generate_trial_characteristics(
-                ("left", random.choice(["short", "long"]), 1), settings
+                ("left", random.choice(["short", "long"]), 1), next(random_values)
             )
 
-            create_stimulus_frame(stimuli, [0, 0, 1], "middle", settings)
-            settings["window"].flip()
-            core.wait(stimulus["target_duration"] / 1000)
+            show_for_frames(
+                stimulus.target_duration / 1000,
+                lambda: create_stimulus_frame(stimuli, [0, 0, 1], "middle", settings),
+                settings,
+            )
 
             # Delay
-            draw_fixation_dot(stimuli["fixation_dot"], settings)
-            settings["window"].flip()
-            core.wait(1.5)
+            show_for_frames(
+                1.5,
+                lambda: draw_fixation_dot(stimuli["fixation_dot"], settings),
+                settings,
+            )
 
             # Allow response
             report = get_duration_response(
                 stimuli,
-                stimulus["target_duration"],
-                stimulus["target_duration_cat"],
+                stimulus.target_duration,
+                stimulus.target_duration_cat,
                 "duration",
                 None,
                 None,
@@ -142,26 +165,28 @@ def practice_duration_response(stimuli, settings):
             performance.append(int(report["duration_diff_abs"]))
 
             # Show feedback
-            draw_fixation_dot(stimuli["fixation_dot"], settings)
-            show_text(
-                f"{report['performance']}",
-                settings["window"],
-                (0, settings["deg2pix"](0.3)),
-            )
+            def draw_feedback():
+                draw_fixation_dot(stimuli["fixation_dot"], settings)
+                show_text(
+                    str(report["performance"]),
+                    settings["window"],
+                    settings["text_above_dot"],
+                )
 
-            if report["premature_pressed"] == True:
-                show_text("!", settings["window"], (0, -settings["deg2pix"](0.3)))
+                if report["premature_pressed"] == True:
+                    show_text("!", settings["window"], settings["text_below_dot"])
 
-            settings["window"].flip()
-            sleep(0.25)
+            show_for_frames(0.25, draw_feedback, settings)
 
             # Pause before next one
-            draw_fixation_dot(stimuli["fixation_dot"], settings)
-            settings["window"].flip()
-            sleep(random.randint(1500, 2000) / 1000)
+            show_for_frames(
+                next(pauses),
+                lambda: draw_fixation_dot(stimuli["fixation_dot"], settings),
+                settings,
+            )
 
             # Check for pressed 'q'
-            check_quit(settings["keyboard"])
+            check_quit()
 
     except KeyboardInterrupt:
         avg_score = round(mean(performance)) if len(performance) > 0 else 0
@@ -176,26 +201,28 @@ def practice_duration_response(stimuli, settings):
         wait_for_key(["space"], settings["keyboard"])
 
         # Make sure any clicks made during the break aren't saved
-        event.Mouse(visible=False, win=settings["window"]).clickReset()
+        settings["mouse"].clickReset()
+
+
+def practice_schedule(settings, rng):
+    # Endless practice conditions, balanced per 8 trials like the experimental blocks
+    while True:
+        yield from zip(
+            create_trial_list(8, rng), draw_random_trial_values(8, settings, rng)
+        )
 
 
 def practice_trials(block_type, stimuli, settings):
     # Make sure mouse is invisible
-    event.Mouse(visible=False, win=settings["window"])
+    settings["mouse"].setVisible(False)
 
     # Practice full trials of specific block type until participant chooses to stop
     try:
         performance = []
-        while True:
-            target_position = random.choice(["left", "right"])
-            target_duration = random.choice(["short", "long"])
-            target_item = random.choice([1, 2])
-
-            stimulus = generate_trial_characteristics(
-                (target_position, target_duration, target_item), settings
-            )
+        for conditions, random_values in practice_schedule(settings, default_rng()):
+            stimulus = generate_trial_characteristics(conditions, random_values)
             report = single_trial(
-                **stimulus,
+                stimulus,
                 block_type=block_type,
                 stimuli=stimuli,
                 settings=settings,
@@ -229,4 +256,4 @@ def practice_trials(block_type, stimuli, settings):
         wait_for_key(["space"], settings["keyboard"])
 
         # Make sure any clicks made during the break aren't saved
-        event.Mouse(visible=False, win=settings["window"]).clickReset()
+        settings["mouse"].clickReset()
@@ -6,7 +6,7 @@ To run the 'microsaccade bias colour vs. duration' experiment, see main.py.
 made by Anna van Harmelen, 2025
 """
 
-from psychopy import visual, event
+from psychopy import core, visual
 from psychopy.hardware.keyboard import Keyboard
 from stimuli import (
     draw_colour_wheel,
@@ -15,11 +15,18 @@ from stimuli import (
     RADIUS_COLOUR_WHEEL as RADIUS,
     INNER_RADIUS_COLOUR_WHEEL as INNER_RADIUS,
 )
-from time import time
+from time import perf_counter
+from math import atan2, degrees
 import numpy as np
-from eyetracker import get_trigger
+from eyetracker import get_trigger_message
 import random
 
+# Direction (cos, sin) of the middle of each 1-degree segment of the colour wheel
+SEGMENT_MIDDLES = np.radians(np.arange(360) + 0.5)
+MARKER_DIRECTIONS = list(
+    zip(np.cos(SEGMENT_MIDDLES).tolist(), np.sin(SEGMENT_MIDDLES).tolist())
+)
+
 
 def make_marker(radius, inner_radius, settings):
     # Create a marker for the selected colour preview
@@ -39,38 +46,40 @@ def get_colour(mouse_pos, offset, colours):
     mouse_x, mouse_y = mouse_pos
 
     # Determine current colour based on mouse position
-    angle = (np.degrees(np.arctan2(mouse_y, mouse_x)) + 360) % 360
-    colour_angle = angle - offset
-    if colour_angle > 360:
-        colour_angle -= 360
+    angle = degrees(atan2(mouse_y, mouse_x)) % 360
+    colour_angle = (angle - offset) % 360
     current_colour = colours[int(colour_angle)]
 
     return current_colour, angle
 
 
-def move_marker(marker, mouse_pos, offset, colours, radius, inner_radius, settings):
-    # Get current selected colour and use for marker
+def move_marker(marker, mouse_pos, offset, colours, settings, previous_colour=None):
+    # Get current selected colour
     current_colour, angle = get_colour(mouse_pos, offset, colours)
-    marker.fillColor = current_colour
 
-    # Fix the marker's position to the colour wheel's radius
-    marker.pos = (
-        settings["deg2pix"]((radius + inner_radius) / 2 * np.cos(np.radians(angle))),
-        settings["deg2pix"]((radius + inner_radius) / 2 * np.sin(np.radians(angle))),
-    )
+    # Only update the marker when it moved onto another segment (the offset is a whole
+    # number of degrees, so that's exactly when the colour changes), as PsychoPy
+    # validates every new colour, position and orientation
+    if current_colour is not previous_colour:
+        marker.fillColor = current_colour
+
+        # Snap the marker to the middle of the selected segment, on the colour wheel's radius
+        segment = int(angle) % 360
+        cos, sin = MARKER_DIRECTIONS[segment]
+        marker.pos = (settings["marker_radius"] * cos, settings["marker_radius"] * sin)
 
-    # Rotate the marker to follow the curve of the donut
-    marker.ori = -angle + 90  # Adjust to span across the width of the donut
+        # Rotate the marker to follow the curve of the donut
+        marker.ori = -(segment + 0.5) + 90  # Adjust to span across the width of the donut
 
     marker.draw()
 
     return current_colour
 
 
-def evaluate_colour_response(selected_colour, target_colour, colours):
+def evaluate_colour_response(selected_colour, target_colour, colour_ids):
     # Determine position of both colours on colour wheel
-    selected_colour_id = colours.index(selected_colour) + 1
-    target_colour_id = colours.index(target_colour) + 1
+    selected_colour_id = colour_ids[tuple(selected_colour)] + 1
+    target_colour_id = colour_ids[tuple(target_colour)] + 1
 
     # Calculate the distance between the two colours
     rgb_distance = selected_colour_id - target_colour_id
@@ -105,18 +114,19 @@ def get_colour_response(
     eyetracker,
     additional_objects=[],
 ):
-    mouse = event.Mouse(visible=False, win=settings["window"])
-    keyboard: Keyboard = settings["keyboard"]
+    mouse = settings["mouse"]
 
     # Check for pressed 'q'
-    check_quit(keyboard)
+    check_quit()
 
     # Check if mouse was prematurely clicked
     _, prematurely_clicked = mouse.getPressed(getTime=True)
 
-    # These timing systems should start at the same time, this is almost true
     mouse.clickReset()
-    idle_reaction_time_start = time()
+
+    # Time the idle reaction from the flip that first shows the colour wheel
+    idle_clock = core.Clock()
+    settings["window"].callOnFlip(idle_clock.reset)
 
     # Prepare the colour wheel and initialise variables
     offset = random.randint(0, 360)
@@ -124,9 +134,9 @@ def get_colour_response(
     marker = make_marker(RADIUS, INNER_RADIUS, settings)
     marker.colorSpace = "hsv"
     selected_colour = None
+    current_colour = None
 
-    # Wait until participant starts moving the mouse
-    while not mouse.mouseMoved():
+    def draw_response_screen():
         # Draw colour wheel
         draw_colour_wheel(stimuli["colour_wheel"], offset, settings)
 
@@ -137,35 +147,29 @@ def get_colour_response(
         for object in additional_objects:
             object.draw()
 
+    # Wait until participant starts moving the mouse
+    while not mouse.mouseMoved():
+        draw_response_screen()
         settings["window"].flip()
 
-    response_started = time()
-    idle_reaction_time = response_started - idle_reaction_time_start
+    response_started = perf_counter()
+    idle_reaction_time = idle_clock.getTime()
 
     if not testing and eyetracker:
-        trigger = get_trigger(
+        message = get_trigger_message(
             "response_onset",
             block_type,
             target_position,
             target_duration_cat,
             target_number,
         )
-        eyetracker.tracker.send_message(f"trig{trigger}")
+        # Send on the flip that first shows the response, not when Python gets here
+        settings["window"].callOnFlip(eyetracker.tracker.send_message, message)
 
     # Show colour wheel and get participant response
     while not selected_colour:
-        # Check for pressed 'q'
-        check_quit(keyboard)
-
-        # Draw colour wheel
-        draw_colour_wheel(stimuli["colour_wheel"], offset, settings)
-
-        # Draw fixation dot
-        draw_fixation_dot(stimuli["fixation_dot"], settings)
-
-        # Show additional objects if applicable
-        for object in additional_objects:
-            object.draw()
+        # Draw the static part of the screen
+        draw_response_screen()
 
         # Move the marker
         current_colour = move_marker(
@@ -173,29 +177,31 @@ def get_colour_response(
             mouse.getPos(),
             offset,
             settings["colours"],
-            RADIUS,
-            INNER_RADIUS,
             settings,
+            current_colour,
         )
 
         # Flip the display
         settings["window"].flip()
 
+        # Check for pressed 'q' (only after a flip, so the onset trigger is never left queued)
+        check_quit()
+
         # Check for mouse click
         if mouse.getPressed()[0]:  # Left mouse click
             selected_colour = current_colour
 
-    response_time = time() - response_started
+    response_time = perf_counter() - response_started
 
     if not testing and eyetracker:
-        trigger = get_trigger(
+        message = get_trigger_message(
             "response_offset",
             block_type,
             target_position,
             target_duration_cat,
             target_number,
         )
-        eyetracker.tracker.send_message(f"trig{trigger}")
+        eyetracker.tracker.send_message(message)
 
     # Make sure mouse clicks made during this trial don't influence the next
     mouse.clickReset()
@@ -210,7 +216,9 @@ def get_colour_response(
         ),
         "selected_colour": selected_colour,
         "colour_wheel_offset": offset,
-        **evaluate_colour_response(selected_colour, target_colour, settings["colours"]),
+        **evaluate_colour_response(
+            selected_colour, target_colour, settings["colour_ids"]
+        ),
     }
 
 
@@ -237,57 +245,60 @@ def get_duration_response(
     testing,
     eyetracker,
 ):
-    mouse = event.Mouse(visible=False, win=settings["window"])
-    keyboard: Keyboard = settings["keyboard"]
+    mouse = settings["mouse"]
 
     # Check for pressed 'q'
-    check_quit(keyboard)
+    check_quit()
 
-    # Show response can start
+    # Show response can start, timing the idle reaction from the flip that shows it
+    idle_clock = core.Clock()
     draw_fixation_dot(stimuli["fixation_dot"], settings, [-1, -1, -1])
+    settings["window"].callOnFlip(idle_clock.reset)
     settings["window"].flip()
 
     # Check if mouse was prematurely clicked
     _, prematurely_clicked = mouse.getPressed(getTime=True)
-
-    # These timing systems should start at the same time, this is almost true
     mouse.clickReset()
-    idle_reaction_time_start = time()
 
-    # Wait for mouse left-click
-    clicked = mouse.getPressed()[0]
-    while not clicked:
-        clicked = mouse.getPressed()[0]
-    response_started = time()
+    # Wait for mouse left-click, one check per frame (like the hold loop below)
+    # so this doesn't spin at 100% CPU
+    while not mouse.getPressed()[0]:
+        draw_fixation_dot(stimuli["fixation_dot"], settings, [-1, -1, -1])
+        settings["window"].flip()
+    response_started = perf_counter()
+    idle_reaction_time = idle_clock.getTime()
 
     if not testing and eyetracker:
-        trigger = get_trigger(
+        message = get_trigger_message(
             "response_onset",
             block_type,
             target_position,
             target_duration_cat,
             target_number,
         )
-        eyetracker.tracker.send_message(f"trig{trigger}")
+        # Send on the flip that first shows the response, not when Python gets here
+        settings["window"].callOnFlip(eyetracker.tracker.send_message, message)
 
-    # Show target item while space is held
-    while mouse.getPressed()[0]:
+    # Show target item while the mouse is held, for at least one frame
+    # so the onset trigger always goes out before the offset trigger
+    while True:
         draw_item(stimuli["stimulus"], [0, 0, 1], "middle", settings)
         settings["window"].flip()
+        if not mouse.getPressed()[0]:
+            break
 
-    # Compute both reaction times
-    response_time = time() - response_started
-    idle_reaction_time = response_started - idle_reaction_time_start
+    # Compute response time
+    response_time = perf_counter() - response_started
 
     if not testing and eyetracker:
-        trigger = get_trigger(
+        message = get_trigger_message(
             "response_offset",
             block_type,
             target_position,
             target_duration_cat,
             target_number,
         )
-        eyetracker.tracker.send_message(f"trig{trigger}")
+        eyetracker.tracker.send_message(message)
 
     # Make sure mouse clicks made during this trial don't influence the next
     mouse.clickReset()
@@ -305,13 +316,30 @@ def get_duration_response(
 
 
 def wait_for_key(key_list, keyboard):
+    global quit_requested
+
     keyboard: Keyboard = keyboard
     keyboard.clearEvents()
     keys = keyboard.waitKeys(keyList=key_list)
 
+    # A 'q' pressed while waiting for another key shouldn't quit later on
+    quit_requested = False
+
     return keys
 
 
-def check_quit(keyboard):
-    if keyboard.getKeys("q"):
+# Set by PsychoPy's global key handler, so loops don't have to poll the keyboard
+quit_requested = False
+
+
+def request_quit():
+    global quit_requested
+    quit_requested = True
+
+
+def check_quit():
+    global quit_requested
+
+    if quit_requested:
+        quit_requested = False
         raise KeyboardInterrupt()
@@ -6,10 +6,11 @@ To run the 'microsaccade bias colour vs. duration' experiment, see main.py.
 made by Anna van Harmelen, 2025
 """
 
-from psychopy import visual
+from psychopy import event, visual
 from psychopy.hardware.keyboard import Keyboard
 from math import degrees, atan2
 import numpy as np
+from response import request_quit
 
 
 def get_monitor_and_dir(testing: bool):
@@ -47,6 +48,20 @@ def get_settings(monitor: dict, directory):
         fullscr=True,
     )
 
+    # Measure the refresh rate, all trial timing is counted in refreshes
+    frame_rate = window.getActualFrameRate()
+    if frame_rate is None or abs(frame_rate - monitor["Hz"]) > 0.01 * monitor["Hz"]:
+        window.close()
+        raise Exception(
+            f"Expected a refresh rate of {monitor['Hz']} Hz, but measured {frame_rate!r}."
+        )
+
+    # Count refreshes that take too long as dropped (recorded during blocks only, see main.py)
+    window.refreshThreshold = 1.2 / frame_rate
+
+    # Let PsychoPy flag 'q' presses itself whenever it handles window events
+    event.globalKeys.add(key="q", func=request_quit)
+
     # Calculate number of visual degrees per pixel on the screen
     degrees_per_pixel = degrees(atan2(0.5 * monitor["width"], monitor["distance"])) / (
         0.5 * monitor["resolution"][0]
@@ -67,9 +82,11 @@ def get_settings(monitor: dict, directory):
         deg2pix=lambda deg: round(deg / degrees_per_pixel),
         num_segments=num_segments,
         colours=colours,
+        colour_ids={tuple(colour): i for i, colour in enumerate(colours)},
         window=window,
         keyboard=Keyboard(),
-        mouse=visual.CustomMouse(win=window, visible=False),
+        mouse=event.Mouse(visible=False, win=window),
         monitor=monitor,
+        frame_rate=frame_rate,
         directory=directory,
     )
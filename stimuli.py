@@ -7,6 +7,7 @@ made by Anna van Harmelen, 2025
 """
 
 from psychopy import visual
+from psychopy.tools.colorspacetools import hsv2rgb
 import numpy as np
 
 DOT_SIZE = 0.1  # radius of fixation dot
@@ -15,9 +16,25 @@ ITEM_ECCENTRICITY = 6.5  # distance from fixation to item
 
 RADIUS_COLOUR_WHEEL = 6
 INNER_RADIUS_COLOUR_WHEEL = 4.5
+WHEEL_RESOLUTION = 1024  # texture pixels across the colour wheel
+
+TEXT_STIMS = {}  # reusable TextStim per window, position and colour, see show_text
 
 
 def initialise_all_stimuli(settings):
+    # Convert the constant distances used every frame to pixels once
+    item_eccentricity = settings["deg2pix"](ITEM_ECCENTRICITY)
+    settings["item_positions"] = {
+        "left": (-item_eccentricity, 0),
+        "right": (item_eccentricity, 0),
+        "middle": (0, 0),
+    }
+    settings["marker_radius"] = settings["deg2pix"](
+        (RADIUS_COLOUR_WHEEL + INNER_RADIUS_COLOUR_WHEEL) / 2
+    )
+    settings["text_above_dot"] = (0, settings["deg2pix"](0.3))
+    settings["text_below_dot"] = (0, -settings["deg2pix"](0.3))
+
     # Create fixation dot
     fixation_dot = visual.Circle(
         win=settings["window"],
@@ -34,41 +51,24 @@ def initialise_all_stimuli(settings):
         colorSpace="hsv",
     )
 
-    # Create colour wheel
+    # Create colour wheel as one ring texture, with one hue segment per degree (like get_colour expects)
     radius = settings["deg2pix"](RADIUS_COLOUR_WHEEL)
     inner_radius = settings["deg2pix"](INNER_RADIUS_COLOUR_WHEEL)
-    num_segments = settings["num_segments"]
-    colour_wheel = []
-
-    for i in range(num_segments):
-        # Create a wedge for each segment
-        verts = [
-            [
-                inner_radius * np.cos(np.radians(i)),
-                inner_radius * np.sin(np.radians(i)),
-            ],
-            [
-                radius * np.cos(np.radians(i)),
-                radius * np.sin(np.radians(i)),
-            ],
-            [
-                radius * np.cos(np.radians(i + 1)),
-                radius * np.sin(np.radians(i + 1)),
-            ],
-            [
-                inner_radius * np.cos(np.radians(i + 1)),
-                inner_radius * np.sin(np.radians(i + 1)),
-            ],
-        ]
-
-        wedge = visual.ShapeStim(
-            settings["window"],
-            vertices=verts,
-            fillColor=settings["colours"][i],
-            lineColor=None,
-            colorSpace="hsv",
-        )
-        colour_wheel.append((wedge, verts))
+
+    # Pixel positions relative to the centre; numpy rows are drawn bottom-to-top
+    coords = ((np.arange(WHEEL_RESOLUTION) + 0.5) / WHEEL_RESOLUTION * 2 - 1) * radius
+    x, y = np.meshgrid(coords, coords)
+    angle = np.degrees(np.arctan2(y, x)) % 360
+    segment = angle.astype(int) % settings["num_segments"]
+    distance = np.hypot(x, y)
+
+    colour_wheel = visual.ImageStim(
+        win=settings["window"],
+        units="pix",
+        image=hsv2rgb(np.array(settings["colours"]))[segment],
+        mask=np.where((distance >= inner_radius) & (distance <= radius), 1.0, -1.0),
+        size=(2 * radius, 2 * radius),
+    )
 
     return {
         "fixation_dot": fixation_dot,
@@ -84,39 +84,40 @@ def draw_fixation_dot(dot, settings, colour="#eaeaea"):
 
 def draw_item(item, colour, position, settings):
     # Parse input
-    if position == "left":
-        pos = (-settings["deg2pix"](ITEM_ECCENTRICITY), 0)
-    elif position == "right":
-        pos = (settings["deg2pix"](ITEM_ECCENTRICITY), 0)
-    elif position == "middle":
-        pos = (0, 0)
-    else:
+    if position not in settings["item_positions"]:
         raise Exception(
             f"Expected 'left', 'right' or 'middle', but received {position!r}."
         )
 
     # Draw stimulus
-    item.pos = pos
+    item.pos = settings["item_positions"][position]
     item.setColor(colour, colorSpace="hsv")
     item.draw()
 
 
 def draw_colour_wheel(colour_wheel, offset, settings):
-    # Individually turn, move and draw each wedge so the colour wheel matches the desired offset
-    angle = np.deg2rad(offset)
-    rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    # Turn the wheel to match the desired offset (ori is clockwise, offset counter-clockwise)
+    if colour_wheel.ori != -offset:
+        colour_wheel.ori = -offset
 
-    for wedge, verts in colour_wheel:
-        wedge.vertices = verts @ rot.T
-        wedge.draw()
+    colour_wheel.draw()
 
     return colour_wheel
 
 
 def show_text(input, window, pos=(0, 0), colour="#ffffff"):
-    textstim = visual.TextStim(
-        win=window, font="Courier New", text=input, color=colour, pos=pos, height=22
-    )
+    # Reuse one TextStim per window, position and colour, creating one loads the font and lays
+    # out the text (per position, so texts redrawn together every frame don't keep swapping,
+    # and per colour, because setting the colour also makes the text re-render)
+    if (window, pos, colour) not in TEXT_STIMS:
+        TEXT_STIMS[window, pos, colour] = visual.TextStim(
+            win=window, font="Courier New", text="", height=22, pos=pos, color=colour
+        )
+    textstim = TEXT_STIMS[window, pos, colour]
+
+    # Only re-layout the text when it actually changed
+    if textstim.text != str(input):
+        textstim.text = str(input)
 
     textstim.draw()
 
@@ -128,4 +129,4 @@ def create_stimulus_frame(stimuli, colour, position, settings, fix_colour="#eaea
 
 def create_cue_frame(stimuli, target_item, settings):
     draw_fixation_dot(stimuli["fixation_dot"], settings)
-    show_text(target_item, settings["window"], pos=(0, settings["deg2pix"](0.3)))
+    show_text(target_item, settings["window"], pos=settings["text_above_dot"])
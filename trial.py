@@ -7,8 +7,8 @@ To run the 'microsaccade bias colour vs. duration' experiment, see main.py.
 made by Anna van Harmelen, 2025
 """
 
-from psychopy.core import wait
-from time import time, sleep
+from functools import partial
+from typing import NamedTuple
 from response import get_colour_response, get_duration_response, check_quit
 from stimuli import (
     draw_fixation_dot,
@@ -16,164 +16,207 @@ from stimuli import (
     create_cue_frame,
     show_text,
 )
-from eyetracker import get_trigger
-import random
+from eyetracker import get_trigger, get_trigger_message
 
 
-def generate_trial_characteristics(conditions, settings):
-    # Extract condition information
-    target_position, target_duration_cat, target_item = conditions
+class TrialSpec(NamedTuple):
+    """
+    Everything that is decided about a trial before it is run.
+    """
 
-    # Decide on random durations of stimuli
-    duration_dict = {
-        "short": random.randint(200, 800),
-        "long": random.randint(1200, 1800),
-    }
-    target_duration = duration_dict[target_duration_cat]
-    duration_dict.pop(target_duration_cat)
+    ITI: int
+    stimuli_colours: list
+    positions: list
+    item_orders: list
+    target_number: int
+    target_colour: list
+    distractor_colour: list
+    target_position: str
+    target_duration: int
+    target_duration_cat: str
+    durations: list
+    duration_cats: list
+
+
+# Item order, item positions and which of (target, distractor) is shown first
+# and second, per (target position, target item)
+TRIAL_LAYOUTS = {
+    ("left", 1): ([1, 2], ["left", "right"], (0, 1)),
+    ("left", 2): ([2, 1], ["right", "left"], (1, 0)),
+    ("right", 1): ([2, 1], ["right", "left"], (0, 1)),
+    ("right", 2): ([1, 2], ["left", "right"], (1, 0)),
+}
 
-    # Decide on random colours of stimulus
-    stimuli_colours = random.sample(settings["colours"], 2)
 
-    # Determine target colours, durations, orders and position
-    if target_position == "left":
-        item_order = [target_item, 2 if target_item == 1 else 1]
-    elif target_position == "right":
-        item_order = [2 if target_item == 1 else 1, target_item]
+def draw_random_trial_values(n_trials, settings, rng):
+    """
+    Draw the random parts of `n_trials` trials (ITI, a short and a long duration
+    and two different stimulus colours) in one go, before any of them are run.
+    """
+    itis = rng.integers(500, 801, size=n_trials)
+    short_durations = rng.integers(200, 801, size=n_trials)
+    long_durations = rng.integers(1200, 1801, size=n_trials)
+
+    # Two different colours per trial, the second a random non-zero step from the first
+    colours = settings["colours"]
+    first_colours = rng.integers(len(colours), size=n_trials)
+    second_colours = (
+        first_colours + rng.integers(1, len(colours), size=n_trials)
+    ) % len(colours)
+
+    return [
+        (ITI, short_duration, long_duration, [colours[first], colours[second]])
+        for ITI, short_duration, long_duration, first, second in zip(
+            itis.tolist(),
+            short_durations.tolist(),
+            long_durations.tolist(),
+            first_colours.tolist(),
+            second_colours.tolist(),
+        )
+    ]
+
+
+def generate_trial_characteristics(conditions, random_values):
+    # Extract condition information
+    target_position, target_duration_cat, target_item = conditions
+    ITI, short_duration, long_duration, stimuli_colours = random_values
+
+    # Pick the durations of stimuli
+    if target_duration_cat == "short":
+        target_duration, other_duration_cat, other_duration = (
+            short_duration,
+            "long",
+            long_duration,
+        )
+    elif target_duration_cat == "long":
+        target_duration, other_duration_cat, other_duration = (
+            long_duration,
+            "short",
+            short_duration,
+        )
     else:
         raise Exception(
-            f"Expected 'left' or 'right', but received {target_position!r}."
+            f"Expected 'short' or 'long', but received {target_duration_cat!r}."
         )
 
-    if target_item == 1:
-        target_colour, distractor_colour = stimuli_colours
-        item_positions = [
-            target_position,
-            "left" if target_position == "right" else "right",
-        ]
-        durations = [target_duration, list(duration_dict.values())[0]]
-        duration_cats = [target_duration_cat, list(duration_dict.keys())[0]]
-    elif target_item == 2:
-        distractor_colour, target_colour = stimuli_colours
-        item_positions = [
-            "left" if target_position == "right" else "right",
-            target_position,
-        ]
-        durations = [list(duration_dict.values())[0], target_duration]
-        duration_cats = [list(duration_dict.keys())[0], target_duration_cat]
-    else:
-        raise Exception(f"Expected 1 or 2, but received {target_item!r}.")
+    # Look up item orders and positions, and whether the target is shown first
+    if (target_position, target_item) not in TRIAL_LAYOUTS:
+        raise Exception(
+            f"Expected 'left' or 'right' and 1 or 2, but received {target_position!r} and {target_item!r}."
+        )
+    item_order, item_positions, (first, second) = TRIAL_LAYOUTS[
+        (target_position, target_item)
+    ]
 
-    return {
-        "ITI": random.randint(500, 800),
-        "stimuli_colours": stimuli_colours,
-        "positions": item_positions,
-        "item_orders": item_order,
-        "target_number": target_item,
-        "target_colour": target_colour,
-        "distractor_colour": distractor_colour,
-        "target_position": target_position,
-        "target_duration": target_duration,
-        "target_duration_cat": target_duration_cat,
-        "durations": durations,
-        "duration_cats": duration_cats,
-    }
+    # Determine target colours and durations, in order of presentation
+    target_colour, distractor_colour = stimuli_colours[first], stimuli_colours[second]
+    durations = [(target_duration, other_duration)[i] for i in (first, second)]
+    duration_cats = [
+        (target_duration_cat, other_duration_cat)[i] for i in (first, second)
+    ]
+
+    return TrialSpec(
+        ITI=ITI,
+        stimuli_colours=stimuli_colours,
+        positions=item_positions,
+        item_orders=item_order,
+        target_number=target_item,
+        target_colour=target_colour,
+        distractor_colour=distractor_colour,
+        target_position=target_position,
+        target_duration=target_duration,
+        target_duration_cat=target_duration_cat,
+        durations=durations,
+        duration_cats=duration_cats,
+    )
 
 
-def do_while_showing(waiting_time, something_to_do, window):
+def show_for_frames(duration, draw, settings):
     """
-    Show whatever is drawn to the screen for exactly `waiting_time` period,
-    while doing `something_to_do` in the mean time.
+    Show whatever `draw` draws for `duration` seconds, counted in screen refreshes
+    at the measured settings["frame_rate"] (redrawing every frame), so the next
+    screen starts exactly on a refresh.
     """
-    window.flip()
-    start = time()
-    something_to_do()
-    wait(waiting_time - (time() - start))
-
-
-def single_trial(
-    ITI,
-    stimuli_colours,
-    positions,
-    item_orders,
-    target_number,
-    target_colour,
-    distractor_colour,
-    target_position,
-    target_duration,
-    target_duration_cat,
-    durations,
-    duration_cats,
-    block_type,
-    stimuli,
-    settings,
-    testing,
-    eyetracker=None,
-):
-    # Initial fixation cross to eliminate jitter caused by for loop
-    draw_fixation_dot(stimuli["fixation_dot"], settings)
-
-    screens = [
-        (0, lambda: 0 / 0, None),  # initial one to make life easier
-        (
-            ITI / 1000,
-            lambda: draw_fixation_dot(stimuli["fixation_dot"], settings),
-            None,
-        ),
+    for _ in range(round(duration * settings["frame_rate"])):
+        draw()
+        settings["window"].flip()
+
+
+def single_trial(spec, block_type, stimuli, settings, testing, eyetracker=None):
+    window = settings["window"]
+    draw_fixation = partial(draw_fixation_dot, stimuli["fixation_dot"], settings)
+
+    # Work out this trial's trigger messages once, before anything is shown
+    triggers = {
+        frame: get_trigger_message(
+            frame,
+            block_type,
+            spec.target_position,
+            spec.target_duration_cat,
+            spec.target_number,
+        )
+        for frame in (
+            "stimulus_onset_1",
+            "stimulus_onset_2",
+            "cue_onset",
+            "feedback_onset",
+        )
+    }
+
+    screens = (
+        (spec.ITI / 1000, draw_fixation, None),
         (
-            durations[0] / 1000,
-            lambda: create_stimulus_frame(
-                stimuli, stimuli_colours[0], positions[0], settings
+            spec.durations[0] / 1000,
+            partial(
+                create_stimulus_frame,
+                stimuli,
+                spec.stimuli_colours[0],
+                spec.positions[0],
+                settings,
             ),
             "stimulus_onset_1",
         ),
-        (0.75, lambda: draw_fixation_dot(stimuli["fixation_dot"], settings), None),
+        (0.75, draw_fixation, None),
         (
-            durations[1] / 1000,
-            lambda: create_stimulus_frame(
-                stimuli, stimuli_colours[1], positions[1], settings
+            spec.durations[1] / 1000,
+            partial(
+                create_stimulus_frame,
+                stimuli,
+                spec.stimuli_colours[1],
+                spec.positions[1],
+                settings,
             ),
             "stimulus_onset_2",
         ),
-        (0.75, lambda: draw_fixation_dot(stimuli["fixation_dot"], settings), None),
+        (0.75, draw_fixation, None),
         (
             0.25,
-            lambda: create_cue_frame(stimuli, target_number, settings),
+            partial(create_cue_frame, stimuli, spec.target_number, settings),
             "cue_onset",
         ),
-        (1.00, lambda: draw_fixation_dot(stimuli["fixation_dot"], settings), None),
-    ]
-
-    # !!! The timing you pass to do_while_showing is the timing for the previously drawn screen. !!!
-    for index, (duration, _, frame) in enumerate(screens[:-1]):
-        # Send trigger if not testing
-        if not testing and frame:
-            trigger = get_trigger(
-                frame, block_type, target_position, target_duration_cat, target_number
-            )
-            eyetracker.tracker.send_message(f"trig{trigger}")
+        (1.00, draw_fixation, None),
+    )
 
-        # Check for pressed 'q'
-        check_quit(settings["keyboard"])
+    for duration, draw, frame in screens:
+        # Check for pressed 'q' (before queueing a trigger, so none is left behind)
+        check_quit()
 
-        # Draw the next screen while showing the current one
-        do_while_showing(duration, screens[index + 1][1], settings["window"])
+        # Send trigger on the first refresh of this screen if not testing
+        if not testing and frame:
+            window.callOnFlip(eyetracker.tracker.send_message, triggers[frame])
 
-    # The for loop only draws the last frame, never shows it
-    # So show it here + wait
-    settings["window"].flip()
-    wait(screens[-1][0])
+        show_for_frames(duration, draw, settings)
 
     # Let participant respond, type depends on block type
     if block_type == "colour":
         response = get_colour_response(
             stimuli,
-            target_colour,
-            target_duration,
-            target_duration_cat,
+            spec.target_colour,
+            spec.target_duration,
+            spec.target_duration_cat,
             block_type,
-            target_position,
-            target_number,
+            spec.target_position,
+            spec.target_number,
             settings,
             testing,
             eyetracker,
@@ -181,46 +224,36 @@ def single_trial(
     elif block_type == "duration":
         response = get_duration_response(
             stimuli,
-            target_duration,
-            target_duration_cat,
+            spec.target_duration,
+            spec.target_duration_cat,
             block_type,
-            target_position,
-            target_number,
+            spec.target_position,
+            spec.target_number,
             settings,
             testing,
             eyetracker,
         )
 
     # Show performance
-    draw_fixation_dot(stimuli["fixation_dot"], settings)
-    show_text(
-        f"{response['performance']}", settings["window"], (0, settings["deg2pix"](0.3))
-    )
+    def draw_feedback():
+        draw_fixation()
+        show_text(str(response["performance"]), window, settings["text_above_dot"])
 
-    if response["premature_pressed"] == True:
-        show_text("!", settings["window"], (0, -settings["deg2pix"](0.3)))
+        if response["premature_pressed"] == True:
+            show_text("!", window, settings["text_below_dot"])
 
     if not testing:
-        trigger = get_trigger(
-            "feedback_onset",
-            block_type,
-            target_position,
-            target_duration_cat,
-            target_number,
-        )
-        eyetracker.tracker.send_message(f"trig{trigger}")
-
-    settings["window"].flip()
+        window.callOnFlip(eyetracker.tracker.send_message, triggers["feedback_onset"])
 
-    sleep(0.25)
+    show_for_frames(0.25, draw_feedback, settings)
 
     return {
         "condition_code": get_trigger(
             "stimulus_onset_1",
             block_type,
-            target_position,
-            target_duration_cat,
-            target_number,
+            spec.target_position,
+            spec.target_duration_cat,
+            spec.target_number,
         ),
         **response,
     }